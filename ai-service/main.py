@@ -5,23 +5,33 @@ Main FastAPI application for story generation and content validation
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, field_validator
 from typing import List, Optional
 import uvicorn
+import asyncio
+import httpx
+import logging
 import os
+from concurrent.futures import ProcessPoolExecutor
 from dotenv import load_dotenv
 
-from src.story_generator.generator import StoryGenerator
-from src.content_validator.validator import ContentValidator
+from src.story_generator.generator import StoryGenerator, StoryGenerationThrottled
+from src.story_generator.batcher import StoryBatcher
+from src.content_validator.validator import ContentValidator, init_validation_worker
 from src.audio_generator.generator import AudioGenerator
 
 # Load environment variables
 load_dotenv()
 
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "info").upper())
+logger = logging.getLogger(__name__)
+
 app = FastAPI(
     title="LexiLoop AI Service",
     description="AI-powered story generation and content validation service",
-    version="0.1.0"
+    version="0.1.0",
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware
@@ -33,10 +43,80 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Shared HTTP/2 keep-alive pool for upstream APIs (OpenAI, Azure TTS)
+http_client = httpx.AsyncClient(
+    http2=True,
+    timeout=httpx.Timeout(60.0, connect=10.0),
+    limits=httpx.Limits(max_keepalive_connections=64, max_connections=256)
+)
+
+# Bound concurrent upstream calls to stay within provider rate limits. Limits are
+# per worker process, so the service as a whole allows up to WEB_CONCURRENCY times as many
+OPENAI_CONCURRENCY = int(os.getenv("OPENAI_CONCURRENCY", 16))
+AZURE_TTS_CONCURRENCY = int(os.getenv("AZURE_TTS_CONCURRENCY", 20))
+openai_semaphore = asyncio.Semaphore(OPENAI_CONCURRENCY)
+tts_semaphore = asyncio.Semaphore(AZURE_TTS_CONCURRENCY)
+
 # Initialize services
-story_generator = StoryGenerator()
+story_generator = StoryGenerator(http_client=http_client, concurrency=openai_semaphore)
 content_validator = ContentValidator()
-audio_generator = AudioGenerator()
+audio_generator = AudioGenerator(http_client=http_client)
+
+# Server worker processes, and validation processes per server worker
+# (split the cores between them by default)
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+VALIDATOR_WORKERS = int(os.getenv("VALIDATOR_WORKERS", max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY)))
+
+# Coalesce concurrent story requests into batched generator calls
+story_batcher = StoryBatcher(
+    story_generator,
+    max_batch=int(os.getenv("STORY_BATCH_SIZE", 8)),
+    max_wait_ms=int(os.getenv("STORY_BATCH_WAIT_MS", 25))
+)
+
+# Background maintenance tasks, cancelled on shutdown
+background_tasks = set()
+
+async def prune_audio_cache_periodically():
+    """Evict aged-out generated audio once a day"""
+    while True:
+        try:
+            removed = await audio_generator.prune_cache()
+            if removed:
+                logger.info("Pruned %d cached audio files", removed)
+        except Exception as e:
+            logger.warning("Audio cache pruning failed: %s", e)
+        await asyncio.sleep(24 * 60 * 60)
+
+@app.on_event("startup")
+async def startup():
+    await story_generator.warmup()
+    await story_batcher.start()
+    
+    # Run validation in worker processes so it neither blocks the event loop nor serializes on the GIL
+    content_validator.executor = ProcessPoolExecutor(
+        max_workers=VALIDATOR_WORKERS,
+        initializer=init_validation_worker
+    )
+    
+    task = asyncio.create_task(prune_audio_cache_periodically())
+    background_tasks.add(task)
+
+@app.on_event("shutdown")
+async def shutdown():
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    
+    await story_batcher.stop()
+    
+    if content_validator.executor:
+        content_validator.executor.shutdown(cancel_futures=True)
+        content_validator.executor = None
+    
+    await story_generator.close()
+    await audio_generator.close()
+    await http_client.aclose()
 
 # Request/Response models
 class GenerateStoryRequest(BaseModel):
@@ -45,6 +125,20 @@ class GenerateStoryRequest(BaseModel):
     story_type: str = "general"
     max_length: int = 800
 
+    @field_validator("vocabulary")
+    @classmethod
+    def clean_vocabulary(cls, vocabulary: List[str]) -> List[str]:
+        """Normalize and dedupe words so bad input is rejected before any upstream call"""
+        words = list(dict.fromkeys(word.strip().lower() for word in vocabulary if word.strip()))
+        
+        if not words:
+            raise ValueError("Vocabulary list cannot be empty")
+        
+        if len(words) > 20:
+            raise ValueError("Too many vocabulary words (max 20)")
+        
+        return words
+
 class StoryResponse(BaseModel):
     content: str
     vocabulary_used: List[str]
@@ -57,6 +151,16 @@ class HealthResponse(BaseModel):
     status: str
     services: dict
 
+async def generate_story_audio(content: str) -> Optional[str]:
+    """Generate audio for a story (optional, failures don't fail the request)"""
+    try:
+        async with tts_semaphore:
+            return await audio_generator.generate_audio(content)
+    except Exception as e:
+        # Audio generation is optional, log error but don't fail the request
+        logger.warning("Audio generation failed: %s", e)
+        return None
+
 @app.get("/", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint"""
@@ -73,21 +177,17 @@ async def health_check():
 async def generate_story(request: GenerateStoryRequest):
     """Generate a story with given vocabulary words"""
     try:
-        # Validate vocabulary input
-        if not request.vocabulary or len(request.vocabulary) == 0:
-            raise HTTPException(status_code=400, detail="Vocabulary list cannot be empty")
-        
-        if len(request.vocabulary) > 20:
-            raise HTTPException(status_code=400, detail="Too many vocabulary words (max 20)")
-        
         # Generate story
-        story = await story_generator.generate_story(
+        story = await story_batcher.submit(
             vocabulary=request.vocabulary,
             difficulty=request.difficulty,
             story_type=request.story_type,
             max_length=request.max_length
         )
         
+        # Synthesize audio while the content is validated
+        audio_task = asyncio.create_task(generate_story_audio(story.content))
+        
         # Validate content quality
         is_valid, quality_score = await content_validator.validate(
             story.content, 
@@ -95,15 +195,10 @@ async def generate_story(request: GenerateStoryRequest):
         )
         
         if not is_valid:
+            audio_task.cancel()
             raise HTTPException(status_code=500, detail="Generated content quality is insufficient")
         
-        # Generate audio (optional)
-        audio_url = None
-        try:
-            audio_url = await audio_generator.generate_audio(story.content)
-        except Exception as e:
-            # Audio generation is optional, log error but don't fail the request
-            print(f"Audio generation failed: {e}")
+        audio_url = await audio_task
         
         return StoryResponse(
             content=story.content,
@@ -116,6 +211,12 @@ async def generate_story(request: GenerateStoryRequest):
         
     except HTTPException:
         raise
+    except StoryGenerationThrottled as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(int(StoryGenerator.NEGATIVE_CACHE_TTL.total_seconds()))}
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
@@ -139,10 +240,23 @@ async def test_azure_tts():
 
 if __name__ == "__main__":
     port = int(os.getenv("AI_SERVICE_PORT", 8001))
-    uvicorn.run(
-        "main:app",
-        host="0.0.0.0",
-        port=port,
-        reload=True,
-        log_level="info"
-    )
\ No newline at end of file
+    
+    if os.getenv("ENVIRONMENT") == "development":
+        # Auto-reload implies a single worker
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",
+            port=port,
+            reload=True,
+            log_level="info"
+        )
+    else:
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",
+            port=port,
+            workers=WEB_CONCURRENCY,
+            loop="uvloop",
+            http="httptools",
+            log_level=os.getenv("LOG_LEVEL", "info")
+        )
\ No newline at end of file
@@ -4,131 +4,218 @@ Uses Azure Text-to-Speech to generate audio for stories
 """
 
 import os
+import time
 import hashlib
 import asyncio
+import logging
+import tempfile
 from typing import Optional
-import azure.cognitiveservices.speech as speechsdk
-from datetime import datetime
+from xml.sax.saxutils import escape
+import httpx
+
+logger = logging.getLogger(__name__)
 
 class AudioGenerator:
-    def __init__(self):
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
         self.speech_key = os.getenv("AZURE_SPEECH_KEY")
         self.speech_region = os.getenv("AZURE_SPEECH_REGION", "eastus")
         
-        # Configure speech service
+        # Set voice (can be made configurable)
+        self.voice_name = "en-US-JennyNeural"
+        
+        # Audio format settings
+        self.output_format = "audio-16khz-32kbitrate-mono-mp3"
+        
+        # Azure Speech REST endpoints
+        self.tts_url = f"https://{self.speech_region}.tts.speech.microsoft.com/cognitiveservices/v1"
+        self.token_url = f"https://{self.speech_region}.api.cognitive.microsoft.com/sts/v1.0/issueToken"
+        
+        # Access tokens are valid for 10 minutes, refresh a minute early
+        self._access_token: Optional[str] = None
+        self._token_expires_at = 0.0
+        self._token_lock = asyncio.Lock()
+        
+        # Generated files are content-addressed and reused until they age out
+        self.audio_dir = os.path.join(os.getcwd(), "generated_audio")
+        self.cache_max_age_days = int(os.getenv("AUDIO_CACHE_MAX_AGE_DAYS", 30))
+        
+        # Use the shared connection pool when given, otherwise own a client
+        self.http_client = http_client
+        self._owns_http_client = False
         if self.speech_key:
-            self.speech_config = speechsdk.SpeechConfig(
-                subscription=self.speech_key, 
-                region=self.speech_region
-            )
-            
-            # Set voice (can be made configurable)
-            self.speech_config.speech_synthesis_voice_name = "en-US-JennyNeural"
-            
-            # Audio format settings
-            self.speech_config.set_speech_synthesis_output_format(
-                speechsdk.SpeechSynthesisOutputFormat.Audio16Khz32KBitRateMonoMp3
-            )
+            if self.http_client is None:
+                self.http_client = httpx.AsyncClient(
+                    timeout=30,
+                    limits=httpx.Limits(max_connections=256)
+                )
+                self._owns_http_client = True
+            os.makedirs(self.audio_dir, exist_ok=True)
         else:
-            self.speech_config = None
-            print("Warning: Azure Speech Service not configured")
+            logger.warning("Azure Speech Service not configured")
+
+    async def _get_access_token(self) -> str:
+        """Get a cached bearer token for the TTS endpoint, refreshing it when expired"""
+        if self._access_token and time.monotonic() < self._token_expires_at:
+            return self._access_token
+        
+        async with self._token_lock:
+            if not self._access_token or time.monotonic() >= self._token_expires_at:
+                response = await self.http_client.post(
+                    self.token_url,
+                    headers={"Ocp-Apim-Subscription-Key": self.speech_key}
+                )
+                response.raise_for_status()
+                self._access_token = response.text
+                self._token_expires_at = time.monotonic() + 9 * 60
+            
+            return self._access_token
+
+    def _build_ssml(self, text: str) -> bytes:
+        """Wrap text in the SSML document expected by the TTS endpoint"""
+        ssml = (
+            "<speak version='1.0' xml:lang='en-US'>"
+            f"<voice name='{self.voice_name}'>{escape(text)}</voice>"
+            "</speak>"
+        )
+        return ssml.encode("utf-8")
+
+    async def _request_headers(self) -> dict:
+        """Build headers for a synthesis request"""
+        token = await self._get_access_token()
+        return {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/ssml+xml",
+            "X-Microsoft-OutputFormat": self.output_format,
+            "User-Agent": "LexiLoop-AI-Service"
+        }
+
+    def _audio_filename(self, text: str) -> str:
+        """Content-addressed filename: the same text and voice always map to the same file"""
+        digest = hashlib.blake2b(f"{self.voice_name}\n{text}".encode(), digest_size=10).hexdigest()
+        return f"{digest}_{self.voice_name}.mp3"
+
+    async def _raise_for_status(self, response: httpx.Response):
+        """Raise a descriptive error for a failed synthesis response"""
+        if response.status_code == 200:
+            return
+        
+        if response.status_code == 401:
+            # Token revoked or expired early, force a refresh on the next call
+            self._access_token = None
+        
+        error_details = (await response.aread()).decode(errors="ignore")
+        raise Exception(f"Speech synthesis failed ({response.status_code}): {error_details}")
 
     async def generate_audio(self, text: str) -> Optional[str]:
         """
         Generate audio file from text using Azure TTS
         Returns the file path/URL of the generated audio
         """
-        if not self.speech_config:
-            print("Azure TTS not configured, skipping audio generation")
+        if not self.speech_key:
+            logger.debug("Azure TTS not configured, skipping audio generation")
             return None
         
         try:
-            # Create unique filename based on text hash
-            text_hash = hashlib.md5(text.encode()).hexdigest()[:12]
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"story_audio_{timestamp}_{text_hash}.mp3"
-            
-            # Create audio directory if it doesn't exist
-            audio_dir = os.path.join(os.getcwd(), "generated_audio")
-            os.makedirs(audio_dir, exist_ok=True)
-            
-            file_path = os.path.join(audio_dir, filename)
+            filename = self._audio_filename(text)
+            file_path = os.path.join(self.audio_dir, filename)
             
-            # Configure audio output to file
-            audio_config = speechsdk.audio.AudioOutputConfig(filename=file_path)
-            
-            # Create synthesizer
-            synthesizer = speechsdk.SpeechSynthesizer(
-                speech_config=self.speech_config,
-                audio_config=audio_config
-            )
-            
-            # Run synthesis in thread pool to avoid blocking
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(
-                None, 
-                synthesizer.speak_text, 
-                text
-            )
+            if os.path.exists(file_path):
+                # Refresh the age so frequently replayed audio isn't pruned
+                os.utime(file_path)
+                logger.debug("Audio retrieved from cache: %s", filename)
+                return f"/audio/{filename}"
             
-            if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
-                print(f"Audio synthesized successfully: {filename}")
+            # Synthesize into a temp file and move it into place atomically,
+            # so a concurrent reader never sees a partial MP3
+            fd, temp_path = tempfile.mkstemp(dir=self.audio_dir, suffix=".part")
+            try:
+                with os.fdopen(fd, "wb") as audio_file:
+                    async with self.http_client.stream(
+                        "POST",
+                        self.tts_url,
+                        headers=await self._request_headers(),
+                        content=self._build_ssml(text)
+                    ) as response:
+                        await self._raise_for_status(response)
+                        
+                        async for chunk in response.aiter_bytes():
+                            audio_file.write(chunk)
                 
-                # Return relative path or URL (in real deployment, this would be a CDN URL)
-                return f"/audio/{filename}"
+                # mkstemp creates owner-only files, audio is served publicly
+                os.chmod(temp_path, 0o644)
+                os.replace(temp_path, file_path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
             
-            elif result.reason == speechsdk.ResultReason.Canceled:
-                cancellation_details = result.cancellation_details
-                print(f"Speech synthesis canceled: {cancellation_details.reason}")
-                if cancellation_details.error_details:
-                    print(f"Error details: {cancellation_details.error_details}")
-                return None
+            logger.info("Audio synthesized successfully: %s", filename)
+            
+            # Return relative path or URL (in real deployment, this would be a CDN URL)
+            return f"/audio/{filename}"
                 
         except Exception as e:
-            print(f"Audio generation error: {e}")
+            logger.warning("Audio generation error: %s", e)
             return None
 
+    async def prune_cache(self) -> int:
+        """Delete generated audio older than the cache max age. Returns the number of files removed"""
+        max_age_seconds = self.cache_max_age_days * 24 * 60 * 60
+        return await asyncio.to_thread(self._prune_directory, self.audio_dir, max_age_seconds)
+
+    @staticmethod
+    def _prune_directory(audio_dir: str, max_age_seconds: float) -> int:
+        """Remove files in audio_dir not modified within max_age_seconds"""
+        if not os.path.isdir(audio_dir):
+            return 0
+        
+        cutoff = time.time() - max_age_seconds
+        removed = 0
+        for entry in os.scandir(audio_dir):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                # Removed concurrently
+                continue
+        
+        return removed
+
     async def test_connection(self) -> dict:
         """Test Azure TTS service connection"""
-        if not self.speech_config:
+        if not self.speech_key:
             raise Exception("Azure Speech Service not configured")
         
         try:
             # Test with a simple phrase
             test_text = "Hello, this is a test of the LexiLoop audio generation service."
             
-            # Use memory stream for testing (don't save file)
-            audio_config = speechsdk.audio.AudioOutputConfig(use_default_speaker=False)
-            synthesizer = speechsdk.SpeechSynthesizer(
-                speech_config=self.speech_config,
-                audio_config=None  # Output to memory
+            # Keep the audio in memory for testing (don't save file)
+            response = await self.http_client.post(
+                self.tts_url,
+                headers=await self._request_headers(),
+                content=self._build_ssml(test_text)
             )
+            await self._raise_for_status(response)
             
-            # Run synthesis
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(
-                None,
-                synthesizer.speak_text,
-                test_text
-            )
-            
-            if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
-                audio_data_length = len(result.audio_data) if result.audio_data else 0
-                return {
-                    "service": "Azure Text-to-Speech",
-                    "voice": self.speech_config.speech_synthesis_voice_name,
-                    "region": self.speech_region,
-                    "test_text": test_text,
-                    "audio_data_size": audio_data_length,
-                    "status": "success"
-                }
-            else:
-                cancellation_details = result.cancellation_details
-                raise Exception(f"TTS test failed: {cancellation_details.reason}")
+            return {
+                "service": "Azure Text-to-Speech",
+                "voice": self.voice_name,
+                "region": self.speech_region,
+                "test_text": test_text,
+                "audio_data_size": len(response.content),
+                "status": "success"
+            }
                 
         except Exception as e:
             raise Exception(f"Azure TTS connection test failed: {str(e)}")
 
+    async def close(self):
+        """Close the HTTP connection pool (a shared client is closed by its owner)"""
+        if self.http_client and self._owns_http_client:
+            await self.http_client.aclose()
+
     def get_available_voices(self) -> list:
         """Get list of available voices (for future use)"""
         # This would typically query the Azure service for available voices
@@ -5,9 +5,70 @@ Validates the quality and appropriateness of generated stories
 
 import re
 import asyncio
-from typing import List, Tuple, Dict
+import functools
+import hashlib
+import logging
+from collections import Counter, OrderedDict
+from concurrent.futures import Executor
+from typing import FrozenSet, List, Optional, Tuple, Dict
 from dataclasses import dataclass
 
+logger = logging.getLogger(__name__)
+
+# Sentence and punctuation patterns
+_SENT_SPLIT = re.compile(r'[.!?]+')
+_MISSING_SPACE = re.compile(r'[.!?][a-zA-Z]')
+
+# Coherence indicator words per group, with the score per distinct word and the group cap
+_COHERENCE_INDICATORS = {
+    'transitions': (['however', 'therefore', 'meanwhile', 'then', 'next', 'finally', 'first', 'second', 'later', 'after', 'before'], 0.05, 0.2),
+    'pronouns': (['he', 'she', 'it', 'they', 'this', 'that', 'these', 'those'], 0.02, 0.15),
+    'connectors': (['and', 'but', 'or', 'so', 'because', 'since', 'although', 'while'], 0.03, 0.15)
+}
+_COHERENCE_PATTERN = re.compile(
+    r'\b(' + '|'.join(word for words, _, _ in _COHERENCE_INDICATORS.values() for word in words) + r')\b'
+)
+
+# Syllable estimation patterns
+_SUFFIX = re.compile(r'(ed|es|s)$')
+_VOWEL_GROUP = re.compile(r'[aeiouy]+')
+
+@functools.lru_cache(maxsize=8192)
+def _estimate_syllables(word: str) -> int:
+    """Estimate syllable count for a word (memoized, stories reuse most of their words)"""
+    word = word.lower().strip()
+    if not word:
+        return 0
+    
+    # Remove common suffixes that don't add syllables
+    word = _SUFFIX.sub('', word)
+    
+    # Count vowel groups
+    syllable_count = len(_VOWEL_GROUP.findall(word))
+    
+    # Handle silent 'e'
+    if word.endswith('e') and syllable_count > 1:
+        syllable_count -= 1
+    
+    return max(1, syllable_count)
+
+# Common English words for readability analysis
+COMMON_WORDS = frozenset({
+    'the', 'be', 'to', 'of', 'and', 'a', 'in', 'that', 'have',
+    'i', 'it', 'for', 'not', 'on', 'with', 'he', 'as', 'you',
+    'do', 'at', 'this', 'but', 'his', 'by', 'from', 'they',
+    'she', 'her', 'or', 'an', 'will', 'my', 'one', 'all',
+    'would', 'there', 'their', 'what', 'so', 'up', 'out',
+    'if', 'about', 'who', 'get', 'which', 'go', 'me', 'when',
+    'make', 'can', 'like', 'time', 'no', 'just', 'him', 'know',
+    'take', 'people', 'into', 'year', 'your', 'good', 'some',
+    'could', 'them', 'see', 'other', 'than', 'then', 'now',
+    'look', 'only', 'come', 'its', 'over', 'think', 'also',
+    'back', 'after', 'use', 'two', 'how', 'our', 'work',
+    'first', 'well', 'way', 'even', 'new', 'want', 'because',
+    'any', 'these', 'give', 'day', 'most', 'us'
+})
+
 @dataclass
 class ValidationResult:
     is_valid: bool
@@ -17,70 +78,114 @@ class ValidationResult:
     readability_score: float
     coherence_score: float
 
+@dataclass
+class TextStats:
+    content_lower: str
+    sentences: List[str]
+    capitalized_sentences: int
+    word_count: int
+    has_periods: bool
+    has_proper_spacing: bool
+
 class ContentValidator:
-    def __init__(self):
+    def __init__(self, executor: Optional[Executor] = None):
         self.min_quality_threshold = 0.7
         
+        # Optional executor (e.g. a process pool) to run validation off the event loop
+        self.executor = executor
+        
         # Common English words for readability analysis
-        self.common_words = {
-            'the', 'be', 'to', 'of', 'and', 'a', 'in', 'that', 'have',
-            'i', 'it', 'for', 'not', 'on', 'with', 'he', 'as', 'you',
-            'do', 'at', 'this', 'but', 'his', 'by', 'from', 'they',
-            'she', 'her', 'or', 'an', 'will', 'my', 'one', 'all',
-            'would', 'there', 'their', 'what', 'so', 'up', 'out',
-            'if', 'about', 'who', 'get', 'which', 'go', 'me', 'when',
-            'make', 'can', 'like', 'time', 'no', 'just', 'him', 'know',
-            'take', 'people', 'into', 'year', 'your', 'good', 'some',
-            'could', 'them', 'see', 'other', 'than', 'then', 'now',
-            'look', 'only', 'come', 'its', 'over', 'think', 'also',
-            'back', 'after', 'use', 'two', 'how', 'our', 'work',
-            'first', 'well', 'way', 'even', 'new', 'want', 'because',
-            'any', 'these', 'give', 'day', 'most', 'us'
-        }
+        self.common_words = COMMON_WORDS
+        
+        # Only common words the syllable heuristic rates as complex can change the
+        # complexity count, so readability checks membership against this subset
+        self._complex_common_words = frozenset(
+            word for word in self.common_words if _estimate_syllables(word) > 2
+        )
+        
+        # Compiled vocabulary patterns, reused across validations of the same word set
+        self._pattern_cache = functools.lru_cache(maxsize=512)(self._build_pattern)
+        
+        # Validation is deterministic, so results are memoized per (content, vocabulary)
+        self._result_cache: OrderedDict = OrderedDict()
+        self._result_cache_size = 10_000
 
     async def validate(self, content: str, vocabulary: List[str]) -> Tuple[bool, float]:
         """
         Main validation method that checks content quality
         Returns (is_valid, quality_score)
         """
+        cache_key = self._result_cache_key(content, vocabulary)
+        cached_result = self._result_cache.get(cache_key)
+        if cached_result is not None:
+            self._result_cache.move_to_end(cache_key)
+            return cached_result
+        
         try:
-            # Run all validation checks
-            validation_result = await self._comprehensive_validation(content, vocabulary)
-            
-            return validation_result.is_valid, validation_result.quality_score
+            # Run all validation checks, in a worker when an executor is configured
+            if self.executor is not None:
+                loop = asyncio.get_running_loop()
+                validation_result = await loop.run_in_executor(
+                    self.executor,
+                    _validate_in_worker,
+                    content,
+                    tuple(vocabulary)
+                )
+            else:
+                validation_result = self._comprehensive_validation(content, vocabulary)
             
         except Exception as e:
-            print(f"Validation error: {e}")
+            logger.error("Validation error: %s", e)
             return False, 0.0
+        
+        result = (validation_result.is_valid, validation_result.quality_score)
+        self._result_cache[cache_key] = result
+        if len(self._result_cache) > self._result_cache_size:
+            self._result_cache.popitem(last=False)
+        
+        return result
+
+    def _result_cache_key(self, content: str, vocabulary: List[str]) -> Tuple[str, Tuple[str, ...]]:
+        """Key validation results by content digest and normalized vocabulary"""
+        content_hash = hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+        return content_hash, tuple(sorted(word.lower() for word in vocabulary))
 
-    async def _comprehensive_validation(self, content: str, vocabulary: List[str]) -> ValidationResult:
+    def _comprehensive_validation(self, content: str, vocabulary: List[str]) -> ValidationResult:
         """Perform comprehensive content validation"""
         issues = []
         
+        # Lowercase once for every check that matches words
+        content_lower = content.lower()
+        vocab_lower = [word.lower() for word in vocabulary]
+        
         # 1. Basic content checks
-        if len(content.strip()) < 100:
+        content_length = len(content.strip())
+        if content_length < 100:
             issues.append("Content too short")
         
-        if len(content.strip()) > 1500:
+        if content_length > 1500:
             issues.append("Content too long")
         
         # 2. Vocabulary coverage check
-        vocab_coverage = self._check_vocabulary_coverage(content, vocabulary)
+        vocab_coverage = self._check_vocabulary_coverage(content_lower, vocab_lower)
         if vocab_coverage < 0.8:  # At least 80% of vocabulary should be used
             issues.append(f"Low vocabulary coverage: {vocab_coverage:.2f}")
         
+        # Sentences are split once and shared by the remaining checks
+        stats = self._scan(content, content_lower)
+        
         # 3. Readability check
-        readability_score = self._check_readability(content)
+        readability_score = self._check_readability(content, stats)
         if readability_score < 0.5:
             issues.append("Poor readability")
         
         # 4. Coherence check
-        coherence_score = self._check_coherence(content)
+        coherence_score = self._check_coherence(content, stats)
         if coherence_score < 0.6:
             issues.append("Poor coherence")
         
         # 5. Grammar and structure check
-        grammar_score = self._check_basic_grammar(content)
+        grammar_score = self._check_basic_grammar(content, stats)
         if grammar_score < 0.7:
             issues.append("Grammar issues detected")
         
@@ -103,44 +208,85 @@ class ContentValidator:
             coherence_score=coherence_score
         )
 
-    def _check_vocabulary_coverage(self, content: str, vocabulary: List[str]) -> float:
-        """Check what percentage of vocabulary words are used in the content"""
-        if not vocabulary:
+    def _scan(self, content: str, content_lower: Optional[str] = None) -> TextStats:
+        """Collect the sentence and punctuation statistics shared by the checks, once per validation"""
+        sentences = [s for s in (piece.strip() for piece in _SENT_SPLIT.split(content)) if s]
+        
+        return TextStats(
+            content_lower=content.lower() if content_lower is None else content_lower,
+            sentences=sentences,
+            capitalized_sentences=sum(1 for s in sentences if s[0].isupper()),
+            word_count=len(content.split()),
+            has_periods='.' in content,
+            has_proper_spacing=not _MISSING_SPACE.search(content)  # Space after punctuation
+        )
+
+    def _build_pattern(self, vocabulary: FrozenSet[str]) -> Tuple["re.Pattern", FrozenSet[str]]:
+        """
+        Build one word-boundary alternation matching any of the (lowercased) vocabulary
+        words, plus the words a single scan can miss because they sit inside or overlap
+        another entry's match
+        """
+        # Longest first so multi-word entries win over their prefixes
+        alternatives = sorted(vocabulary, key=len, reverse=True)
+        pattern = re.compile(r'\b(?:' + '|'.join(re.escape(word) for word in alternatives) + r')\b')
+        
+        # Matches don't overlap: a word is only hidden if it lies within another
+        # entry ("ice" in "ice cream") or starts inside one's tail ("cream soda"
+        # after "ice cream")
+        shadowable = frozenset(
+            word for word in vocabulary
+            if any(
+                other != word and (
+                    word in other
+                    or any(other.endswith(word[:k]) for k in range(1, min(len(word), len(other))))
+                )
+                for other in vocabulary
+            )
+        )
+        return pattern, shadowable
+
+    def _check_vocabulary_coverage(self, content_lower: str, vocab_lower: List[str]) -> float:
+        """Check what percentage of vocabulary words are used in the content (both already lowercased)"""
+        if not vocab_lower:
             return 1.0
         
-        content_lower = content.lower()
-        words_found = 0
-        
-        for word in vocabulary:
-            # Check for exact word match (with word boundaries)
-            word_pattern = r'\b' + re.escape(word.lower()) + r'\b'
-            if re.search(word_pattern, content_lower):
-                words_found += 1
+        # Single pass over the content for all words (with word boundaries)
+        pattern, shadowable = self._pattern_cache(frozenset(vocab_lower))
+        found = set(pattern.findall(content_lower))
+
+        # Only words another entry can hide need their own search
+        words_found = sum(
+            1 for word in vocab_lower
+            if word in found or (
+                word in shadowable and re.search(r'\b' + re.escape(word) + r'\b', content_lower)
+            )
+        )
         
-        return words_found / len(vocabulary)
+        return words_found / len(vocab_lower)
 
-    def _check_readability(self, content: str) -> float:
+    def _check_readability(self, content: str, stats: Optional[TextStats] = None) -> float:
         """Simple readability check based on sentence length and word complexity"""
-        sentences = re.split(r'[.!?]+', content)
-        sentences = [s.strip() for s in sentences if s.strip()]
+        if stats is None:
+            stats = self._scan(content)
         
+        sentences = stats.sentences
         if not sentences:
             return 0.0
         
-        total_words = 0
+        # Score each distinct word once and weight by its frequency
+        word_counts = Counter(word for sentence in sentences for word in sentence.split())
+        total_words = sum(word_counts.values())
         total_syllables = 0
         complex_words = 0
+        complex_common_words = self._complex_common_words
         
-        for sentence in sentences:
-            words = sentence.split()
-            total_words += len(words)
+        for word, count in word_counts.items():
+            syllables = self._count_syllables(word)
+            total_syllables += syllables * count
             
-            for word in words:
-                syllables = self._count_syllables(word)
-                total_syllables += syllables
-                
-                if syllables > 2 and word.lower() not in self.common_words:
-                    complex_words += 1
+            if syllables > 2 and not (complex_common_words and word.lower() in complex_common_words):
+                complex_words += count
         
         if total_words == 0:
             return 0.0
@@ -161,96 +307,68 @@ class ContentValidator:
 
     def _count_syllables(self, word: str) -> int:
         """Estimate syllable count for a word"""
-        word = word.lower().strip()
-        if not word:
-            return 0
-        
-        # Remove common suffixes that don't add syllables
-        word = re.sub(r'(ed|es|s)$', '', word)
-        
-        # Count vowel groups
-        vowels = 'aeiouy'
-        syllable_count = 0
-        prev_was_vowel = False
-        
-        for char in word:
-            is_vowel = char in vowels
-            if is_vowel and not prev_was_vowel:
-                syllable_count += 1
-            prev_was_vowel = is_vowel
-        
-        # Handle silent 'e'
-        if word.endswith('e') and syllable_count > 1:
-            syllable_count -= 1
-        
-        return max(1, syllable_count)
+        return _estimate_syllables(word)
 
-    def _check_coherence(self, content: str) -> float:
+    def _check_coherence(self, content: str, stats: Optional[TextStats] = None) -> float:
         """Check story coherence based on structure and flow"""
-        sentences = re.split(r'[.!?]+', content)
-        sentences = [s.strip() for s in sentences if s.strip()]
+        if stats is None:
+            stats = self._scan(content)
         
-        if len(sentences) < 3:
+        if len(stats.sentences) < 3:
             return 0.3
         
-        coherence_indicators = {
-            'transitions': ['however', 'therefore', 'meanwhile', 'then', 'next', 'finally', 'first', 'second', 'later', 'after', 'before'],
-            'pronouns': ['he', 'she', 'it', 'they', 'this', 'that', 'these', 'those'],
-            'connectors': ['and', 'but', 'or', 'so', 'because', 'since', 'although', 'while']
-        }
-        
-        content_lower = content.lower()
+        # One pass for all indicator words, matched as whole words
+        indicators_found = set(_COHERENCE_PATTERN.findall(stats.content_lower))
         coherence_score = 0.5  # Base score
         
-        # Check for transition words
-        transition_count = sum(1 for word in coherence_indicators['transitions'] if word in content_lower)
-        coherence_score += min(0.2, transition_count * 0.05)
-        
-        # Check for pronouns (indicating reference continuity)
-        pronoun_count = sum(1 for word in coherence_indicators['pronouns'] if word in content_lower)
-        coherence_score += min(0.15, pronoun_count * 0.02)
-        
-        # Check for logical connectors
-        connector_count = sum(1 for word in coherence_indicators['connectors'] if word in content_lower)
-        coherence_score += min(0.15, connector_count * 0.03)
+        # Transition words, pronouns (reference continuity) and logical connectors
+        for words, weight, cap in _COHERENCE_INDICATORS.values():
+            count = sum(1 for word in words if word in indicators_found)
+            coherence_score += min(cap, count * weight)
         
         return min(1.0, coherence_score)
 
-    def _check_basic_grammar(self, content: str) -> float:
+    def _check_basic_grammar(self, content: str, stats: Optional[TextStats] = None) -> float:
         """Basic grammar and structure validation"""
+        if stats is None:
+            stats = self._scan(content)
+        
+        if not stats.sentences:
+            return 0.0
+        
         # Simple heuristic checks
         grammar_score = 1.0
         
         # Check for proper capitalization at sentence beginnings
-        sentences = re.split(r'[.!?]+', content)
-        capitalized_sentences = 0
-        
-        for sentence in sentences:
-            sentence = sentence.strip()
-            if sentence and sentence[0].isupper():
-                capitalized_sentences += 1
-        
-        if sentences:
-            capitalization_ratio = capitalized_sentences / len([s for s in sentences if s.strip()])
-            grammar_score *= capitalization_ratio
+        capitalization_ratio = stats.capitalized_sentences / len(stats.sentences)
+        grammar_score *= capitalization_ratio
         
         # Check for basic punctuation
-        has_periods = '.' in content
-        has_proper_spacing = not re.search(r'[.!?][a-zA-Z]', content)  # Space after punctuation
-        
-        if not has_periods:
+        if not stats.has_periods:
             grammar_score *= 0.8
         
-        if not has_proper_spacing:
+        if not stats.has_proper_spacing:
             grammar_score *= 0.9
         
         # Check for extremely long sentences (potential run-ons)
-        words = content.split()
-        if words:
-            sentences_list = re.split(r'[.!?]+', content)
-            if sentences_list:
-                avg_sentence_length = len(words) / len([s for s in sentences_list if s.strip()])
-                if avg_sentence_length > 30:  # Very long sentences
-                    grammar_score *= 0.8
-        
-        return max(0.0, grammar_score)
\ No newline at end of file
+        if stats.word_count:
+            avg_sentence_length = stats.word_count / len(stats.sentences)
+            if avg_sentence_length > 30:  # Very long sentences
+                grammar_score *= 0.8
+        
+        return max(0.0, grammar_score)
+
+# Validator owned by each executor worker process
+_worker_validator: Optional[ContentValidator] = None
+
+def init_validation_worker():
+    """Executor initializer: build the worker's validator and warm its caches"""
+    global _worker_validator
+    _worker_validator = ContentValidator()
+    _worker_validator._comprehensive_validation("This is a warm up sentence. " * 10, ["warm"])
+
+def _validate_in_worker(content: str, vocabulary: Tuple[str, ...]) -> ValidationResult:
+    """Run a full validation inside an executor worker"""
+    if _worker_validator is None:
+        init_validation_worker()
+    return _worker_validator._comprehensive_validation(content, list(vocabulary))
\ No newline at end of file
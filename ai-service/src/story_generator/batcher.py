@@ -0,0 +1,140 @@
+"""
+Story Request Batcher
+Coalesces concurrent story requests into batched generator calls
+"""
+
+import asyncio
+from typing import Dict, List, Optional, Set, Tuple
+
+from .generator import Story, StoryGenerator
+
+class StoryBatcher:
+    def __init__(
+        self,
+        generator: StoryGenerator,
+        max_batch: int = 8,
+        max_wait_ms: int = 25
+    ):
+        self.generator = generator
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._consumer: Optional[asyncio.Task] = None
+        self._dispatches: Set[asyncio.Task] = set()
+
+    async def start(self):
+        """Start the background consumer (call from the app startup hook)"""
+        if self._consumer is None:
+            self._queue = asyncio.Queue()
+            self._consumer = asyncio.create_task(self._consume())
+
+    async def stop(self):
+        """Stop the consumer and wait for dispatched batches to finish"""
+        if self._consumer is None:
+            return
+
+        self._consumer.cancel()
+        try:
+            await self._consumer
+        except asyncio.CancelledError:
+            pass
+        self._consumer = None
+
+        if self._dispatches:
+            await asyncio.gather(*self._dispatches, return_exceptions=True)
+
+        # Fail anything still queued so callers don't hang forever
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(Exception("Story batcher stopped"))
+
+    async def submit(
+        self,
+        vocabulary: List[str],
+        difficulty: int = 1,
+        story_type: str = "general",
+        max_length: int = 800
+    ) -> Story:
+        """Queue a story request and wait for its batch to complete"""
+        if self._consumer is None:
+            # Not started (scripts, tests): fall through to a direct call
+            return await self.generator.generate_story(
+                vocabulary=vocabulary,
+                difficulty=difficulty,
+                story_type=story_type,
+                max_length=max_length
+            )
+
+        # In-process cache hits return at once instead of waiting out a batch window
+        cached_story = self.generator.peek_story(vocabulary, difficulty, story_type)
+        if cached_story is not None:
+            return cached_story
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(((vocabulary, difficulty, story_type, max_length), future))
+        return await future
+
+    async def _consume(self):
+        """Drain up to max_batch requests or until max_wait elapses, then dispatch"""
+        loop = asyncio.get_running_loop()
+
+        batch = []
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                deadline = loop.time() + self.max_wait
+
+                while len(batch) < self.max_batch:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+
+                self._dispatch_batch(batch)
+                batch = []
+        except asyncio.CancelledError:
+            # Requests already taken off the queue would otherwise never resolve
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(Exception("Story batcher stopped"))
+            raise
+
+    def _dispatch_batch(self, batch: List[Tuple[tuple, asyncio.Future]]):
+        """Group a drained batch by prompt parameters and dispatch each group"""
+        # Group by prompt parameters so each batch shares one template
+        groups: Dict[Tuple[int, str, int], List[Tuple[List[str], asyncio.Future]]] = {}
+        for (vocabulary, difficulty, story_type, max_length), future in batch:
+            groups.setdefault((difficulty, story_type, max_length), []).append((vocabulary, future))
+
+        # Dispatch without blocking the consumer on upstream latency
+        for params, items in groups.items():
+            task = asyncio.create_task(self._dispatch(params, items))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, params: Tuple[int, str, int], items: List[Tuple[List[str], asyncio.Future]]):
+        """Run one batched generator call and fan results back to the waiting callers"""
+        difficulty, story_type, max_length = params
+
+        try:
+            results = await self.generator.generate_batch(
+                [vocabulary for vocabulary, _ in items],
+                difficulty=difficulty,
+                story_type=story_type,
+                max_length=max_length
+            )
+        except Exception as e:
+            results = [e] * len(items)
+
+        for (_, future), result in zip(items, results):
+            if future.done():
+                # Caller went away (e.g. client disconnected)
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
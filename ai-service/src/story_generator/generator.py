@@ -5,14 +5,115 @@ Uses OpenAI GPT to generate contextual stories with vocabulary words
 
 import asyncio
 import hashlib
-import json
+import logging
 import os
-from typing import List, Dict, Optional, Tuple
+import re
+from collections import OrderedDict
+from contextlib import nullcontext
+from typing import List, Dict, Optional, Set, Tuple
 from dataclasses import dataclass
+import httpx
+import msgpack
 import redis.asyncio as redis
-from openai import AsyncOpenAI
+from openai import AsyncOpenAI, InternalServerError, RateLimitError
 from datetime import datetime, timedelta
 
+logger = logging.getLogger(__name__)
+
+# Invariant instructions, sent first and byte-identical on every request so the
+# provider's automatic prompt caching can reuse them; per-request values follow
+# in the user message
+STORY_SYSTEM_PROMPT = """You are a creative writing assistant specializing in educational content for English language learners. Write engaging, coherent stories that naturally incorporate vocabulary words.
+
+Requirements:
+1. Use ALL the vocabulary words naturally in the story context
+2. Keep the story within the word range given in the request
+3. Make sure the story is coherent and engaging
+4. Adjust complexity to match the reading level given in the request
+5. Each vocabulary word should appear at least once
+6. Make the story self-contained with a clear beginning, middle, and end"""
+
+# Word tokens used to match vocabulary against the generated story; word
+# characters as the validator's \b coverage check sees them, plus apostrophes
+_WORD_TOKEN = re.compile(r"[\w']+")
+# Whitespace-delimited words, matching what str.split() counts
+_NON_SPACE = re.compile(r"\S+")
+
+def _add_word_forms(tokens: set, word: str):
+    """Add a raw token's matchable forms: quotes stripped, casefolded, and the base of 's possessives"""
+    word = word.strip("'").casefold()
+    if word:
+        tokens.add(word)
+        if word.endswith("'s"):
+            tokens.add(word[:-2])
+
+class _TokenScanner:
+    """Collects casefolded word tokens and a word count from text that arrives in chunks"""
+
+    def __init__(self):
+        self.tokens = set()
+        self.word_count = 0
+        # A word touching the end of a chunk may continue in the next one
+        self._partial = ""
+        self._in_word = False
+
+    def feed(self, text: str):
+        if not text:
+            return
+        
+        word_count = sum(1 for _ in _NON_SPACE.finditer(text))
+        if word_count and self._in_word and not text[0].isspace():
+            word_count -= 1
+        self.word_count += word_count
+        self._in_word = not text[-1].isspace()
+        
+        text = self._partial + text
+        matches = list(_WORD_TOKEN.finditer(text))
+        if matches and matches[-1].end() == len(text):
+            self._partial = matches.pop().group(0)
+        else:
+            self._partial = ""
+        for match in matches:
+            _add_word_forms(self.tokens, match.group(0))
+
+    def finish(self) -> set:
+        if self._partial:
+            _add_word_forms(self.tokens, self._partial)
+            self._partial = ""
+        return self.tokens
+
+# Process-wide clients, shared by every StoryGenerator so connection pools stay warm
+_OPENAI_CLIENT: Optional[AsyncOpenAI] = None
+_REDIS_CLIENT: Optional[redis.Redis] = None
+
+def _get_openai_client(http_client: Optional[httpx.AsyncClient] = None) -> AsyncOpenAI:
+    """Return an OpenAI client, reusing one process-wide pool unless an http_client is given"""
+    global _OPENAI_CLIENT
+    if http_client is not None:
+        return AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=http_client)
+    
+    if _OPENAI_CLIENT is None:
+        _OPENAI_CLIENT = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            http_client=httpx.AsyncClient(
+                http2=True,
+                timeout=httpx.Timeout(60.0, connect=10.0),
+                limits=httpx.Limits(max_keepalive_connections=100, keepalive_expiry=60)
+            )
+        )
+    return _OPENAI_CLIENT
+
+def _get_redis_client() -> redis.Redis:
+    """Return the process-wide Redis client (connections are pooled and opened lazily)"""
+    global _REDIS_CLIENT
+    if _REDIS_CLIENT is None:
+        redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
+        _REDIS_CLIENT = redis.from_url(redis_url, max_connections=50)
+    return _REDIS_CLIENT
+
+class StoryGenerationThrottled(Exception):
+    """Raised while a recent rate limit or upstream error for the same request is cached"""
+
 @dataclass
 class Story:
     content: str
@@ -24,20 +125,39 @@ class Story:
     created_at: datetime
 
 class StoryGenerator:
-    def __init__(self):
-        self.openai_client = AsyncOpenAI(
-            api_key=os.getenv("OPENAI_API_KEY")
-        )
-        self.redis_client = None
-        self._initialize_redis()
+    # Hot stories kept in process, in front of Redis
+    LOCAL_CACHE_SIZE = 512
+    # Redis lifetime of a cached story, refreshed whenever it is read
+    CACHE_TTL = timedelta(hours=24)
+    # How long a rate-limited or failed request is refused before OpenAI is retried
+    NEGATIVE_CACHE_TTL = timedelta(seconds=60)
+
+    def __init__(
+        self,
+        http_client: Optional[httpx.AsyncClient] = None,
+        concurrency: Optional[asyncio.Semaphore] = None
+    ):
+        # A shared http_client reuses pooled keep-alive connections across upstream calls
+        self.openai_client = _get_openai_client(http_client)
+        # Bounds OpenAI calls in flight from this process, one slot per completion
+        self.concurrency = concurrency
+        # Connects lazily on first command; call warmup() to check it up front
+        self.redis_client = _get_redis_client()
         
-        # Story templates for different types
+        # In-process LRU of recently used stories, keyed by _local_key
+        self._local_cache: "OrderedDict[tuple, Story]" = OrderedDict()
+        # Lookups/generations in progress, so concurrent duplicates share one upstream call
+        self._inflight: Dict[tuple, asyncio.Task] = {}
+        # Background cache writes, kept referenced until done and drained on close()
+        self._pending: Set[asyncio.Task] = set()
+        
+        # Story templates for different types, called with (vocabulary, difficulty_text)
         self.story_templates = {
-            "general": "Create an engaging short story that naturally incorporates these vocabulary words: {vocabulary}. The story should be appropriate for {difficulty_text} level learners.",
-            "adventure": "Write an exciting adventure story using these vocabulary words: {vocabulary}. Make it engaging for {difficulty_text} level English learners.",
-            "daily_life": "Create a realistic story about daily life that includes these vocabulary words: {vocabulary}. Keep it suitable for {difficulty_text} level students.",
-            "science": "Write an educational science-themed story incorporating these vocabulary words: {vocabulary}. Make it accessible for {difficulty_text} level learners.",
-            "history": "Create an interesting historical story that uses these vocabulary words: {vocabulary}. Ensure it's appropriate for {difficulty_text} level students."
+            "general": lambda v, d: f"Create an engaging short story that naturally incorporates these vocabulary words: {v}. The story should be appropriate for {d} level learners.",
+            "adventure": lambda v, d: f"Write an exciting adventure story using these vocabulary words: {v}. Make it engaging for {d} level English learners.",
+            "daily_life": lambda v, d: f"Create a realistic story about daily life that includes these vocabulary words: {v}. Keep it suitable for {d} level students.",
+            "science": lambda v, d: f"Write an educational science-themed story incorporating these vocabulary words: {v}. Make it accessible for {d} level learners.",
+            "history": lambda v, d: f"Create an interesting historical story that uses these vocabulary words: {v}. Ensure it's appropriate for {d} level students."
         }
         
         self.difficulty_levels = {
@@ -48,89 +168,182 @@ class StoryGenerator:
             5: "advanced"
         }
 
-    async def _initialize_redis(self):
-        """Initialize Redis connection"""
+    async def warmup(self):
+        """Check the Redis connection, disabling the Redis cache if it is unreachable"""
+        if not self.redis_client:
+            return
+            
         try:
-            redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
-            self.redis_client = redis.from_url(redis_url, decode_responses=True)
             await self.redis_client.ping()
-            print("Redis connection established")
+            logger.info("Redis connection established")
         except Exception as e:
-            print(f"Redis connection failed: {e}")
+            logger.warning("Redis connection failed: %s", e)
             self.redis_client = None
 
-    def _generate_cache_key(self, vocabulary: List[str], difficulty: int, story_type: str) -> str:
-        """Generate a unique cache key for the story parameters"""
-        # Sort vocabulary to ensure consistent cache keys
-        sorted_vocab = sorted(vocabulary)
-        key_string = f"{sorted_vocab}_{difficulty}_{story_type}"
-        return hashlib.md5(key_string.encode()).hexdigest()
+    def _limit(self):
+        """Context manager holding an OpenAI concurrency slot, if a limiter is configured"""
+        return self.concurrency if self.concurrency is not None else nullcontext()
 
-    async def _get_cached_story(self, cache_key: str) -> Optional[Story]:
-        """Retrieve story from cache if available"""
-        if not self.redis_client:
-            return None
+    def _local_key(self, vocabulary: List[str], difficulty: int, story_type: str) -> tuple:
+        """Key for the in-process cache; hashed natively by dict, no digest needed"""
+        return (tuple(sorted(vocabulary)), difficulty, story_type)
+
+    def _redis_key(self, vocabulary: List[str], difficulty: int, story_type: str) -> str:
+        """Generate a unique cache key for the story parameters, as stored in Redis"""
+        # Sort vocabulary to ensure consistent cache keys; join on a control
+        # character rather than building the list's repr
+        key_string = "\x1f".join(sorted(vocabulary)) + f"|{difficulty}|{story_type}"
+        return hashlib.blake2b(key_string.encode(), digest_size=16).hexdigest()
+
+    def _cache_locally(self, local_key: tuple, story: Story):
+        """Insert a story into the in-process LRU, evicting the least recently used"""
+        self._local_cache[local_key] = story
+        self._local_cache.move_to_end(local_key)
+        if len(self._local_cache) > self.LOCAL_CACHE_SIZE:
+            self._local_cache.popitem(last=False)
+
+    def _get_local_story(self, local_key: tuple) -> Optional[Story]:
+        """Retrieve story from the in-process cache if available"""
+        story = self._local_cache.get(local_key)
+        if story is not None:
+            self._local_cache.move_to_end(local_key)
+        return story
+
+    async def _get_cached_stories(self, keys: List[Tuple[tuple, str]]) -> List:
+        """
+        Retrieve stories from Redis in one round trip, filling the in-process cache.
+        Takes (local_key, cache_key) pairs; returns a Story, None on a miss, or a
+        StoryGenerationThrottled while a recent failure is cached, per pair.
+        """
+        results: List = [None] * len(keys)
+        if not self.redis_client or not keys:
+            return results
             
         try:
-            cached_data = await self.redis_client.get(f"story:{cache_key}")
-            if cached_data:
-                story_data = json.loads(cached_data)
-                return Story(**story_data)
+            # Read, refresh the TTLs and check for recent failures in one round trip
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.mget([f"story:{cache_key}" for _, cache_key in keys])
+                pipe.mget([f"story:neg:{cache_key}" for _, cache_key in keys])
+                for _, cache_key in keys:
+                    pipe.expire(f"story:{cache_key}", self.CACHE_TTL)
+                cached_data, failures, *_ = await pipe.execute()
         except Exception as e:
-            print(f"Cache retrieval error: {e}")
+            logger.warning("Cache retrieval error: %s", e)
+            return results
         
-        return None
+        for i, ((local_key, cache_key), data, failure) in enumerate(zip(keys, cached_data, failures)):
+            if data:
+                # Decoded per entry so one unreadable value (e.g. an older format)
+                # only costs a miss for its own key
+                try:
+                    # Stored positionally, in Story field order
+                    story_fields = msgpack.unpackb(data)
+                    story_fields[-1] = datetime.fromisoformat(story_fields[-1])
+                    results[i] = Story(*story_fields)
+                    self._cache_locally(local_key, results[i])
+                    continue
+                except Exception as e:
+                    logger.warning("Unreadable cached story %s: %s", cache_key, e)
+            
+            if failure:
+                results[i] = StoryGenerationThrottled(
+                    "Story generation recently failed for these parameters; retry later"
+                )
+        
+        return results
+
+    async def _get_cached_story(self, local_key: tuple, cache_key: str) -> Optional[Story]:
+        """Retrieve story from Redis if available, filling the in-process cache"""
+        result = (await self._get_cached_stories([(local_key, cache_key)]))[0]
+        if isinstance(result, StoryGenerationThrottled):
+            raise result
+        return result
 
-    async def _cache_story(self, story: Story, expire_hours: int = 24):
-        """Cache the generated story"""
+    async def _cache_story(self, story: Story, ttl: timedelta = CACHE_TTL):
+        """Write the generated story to Redis"""
         if not self.redis_client:
             return
             
         try:
-            story_data = {
-                "content": story.content,
-                "vocabulary_used": story.vocabulary_used,
-                "word_count": story.word_count,
-                "difficulty": story.difficulty,
-                "story_type": story.story_type,
-                "cache_key": story.cache_key,
-                "created_at": story.created_at.isoformat()
-            }
+            # Positional, in Story field order, so key names aren't stored per entry
+            story_fields = [
+                story.content,
+                story.vocabulary_used,
+                story.word_count,
+                story.difficulty,
+                story.story_type,
+                story.cache_key,
+                story.created_at.isoformat()
+            ]
             
             await self.redis_client.setex(
                 f"story:{story.cache_key}",
-                timedelta(hours=expire_hours),
-                json.dumps(story_data)
+                ttl,
+                msgpack.packb(story_fields)
             )
         except Exception as e:
-            print(f"Cache storage error: {e}")
+            logger.warning("Cache storage error: %s", e)
+
+    def _run_in_background(self, coro):
+        """Schedule a coroutine without waiting on it, tracked so close() can drain it"""
+        task = asyncio.create_task(coro)
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _cache_failure(self, cache_key: str):
+        """Remember a transient generation failure so identical requests back off briefly"""
+        if not self.redis_client:
+            return
+            
+        try:
+            await self.redis_client.setex(f"story:neg:{cache_key}", self.NEGATIVE_CACHE_TTL, b"rate_limited")
+        except Exception as e:
+            logger.warning("Cache storage error: %s", e)
+
+    def _find_vocabulary_used(
+        self,
+        content: str,
+        vocabulary: List[str],
+        vocabulary_folded: Optional[List[str]] = None,
+        tokens: Optional[set] = None
+    ) -> List[str]:
+        """Return the vocabulary words that appear as whole words in the content"""
+        if vocabulary_folded is None:
+            vocabulary_folded = [word.casefold() for word in vocabulary]
+        if tokens is None:
+            tokens = set()
+            for match in _WORD_TOKEN.finditer(content):
+                _add_word_forms(tokens, match.group(0))
+        content_folded = None
+        
+        vocabulary_used = []
+        for word, word_folded in zip(vocabulary, vocabulary_folded):
+            if word_folded in tokens:
+                vocabulary_used.append(word)
+            elif not _WORD_TOKEN.fullmatch(word_folded):
+                # Phrases and hyphenated terms span several tokens; fall back to a
+                # word-bounded search so "ice cream" doesn't match "nice creamy"
+                if content_folded is None:
+                    content_folded = content.casefold()
+                if re.search(r'\b' + re.escape(word_folded) + r'\b', content_folded):
+                    vocabulary_used.append(word)
+        
+        return vocabulary_used
 
     def _build_story_prompt(self, vocabulary: List[str], difficulty: int, story_type: str, max_length: int) -> str:
         """Build the prompt for GPT story generation"""
         difficulty_text = self.difficulty_levels.get(difficulty, "intermediate")
         
-        template = self.story_templates.get(story_type, self.story_templates["general"])
-        base_prompt = template.format(
-            vocabulary=", ".join(vocabulary),
-            difficulty_text=difficulty_text
-        )
+        vocabulary_text = ", ".join(vocabulary)
         
-        detailed_prompt = f"""
-{base_prompt}
+        template = self.story_templates.get(story_type, self.story_templates["general"])
+        return f"""{template(vocabulary_text, difficulty_text)}
 
-Requirements:
-1. Use ALL the vocabulary words naturally in the story context
-2. Keep the story between 300-{max_length} words
-3. Make sure the story is coherent and engaging
-4. Adjust complexity to match {difficulty_text} reading level
-5. Each vocabulary word should appear at least once
-6. Make the story self-contained with a clear beginning, middle, and end
+Reading level: {difficulty_text}
+Length: 300-{max_length} words
+Vocabulary words to include: {vocabulary_text}
 
-Vocabulary words to include: {', '.join(vocabulary)}
-
-Please write the story now:
-"""
-        return detailed_prompt
+Please write the story now:"""
 
     async def generate_story(
         self, 
@@ -141,49 +354,131 @@ Please write the story now:
     ) -> Story:
         """Generate a story incorporating the given vocabulary words"""
         
-        # Generate cache key
-        cache_key = self._generate_cache_key(vocabulary, difficulty, story_type)
+        # Normalize once; keys, prompt and usage detection all share these
+        vocabulary, vocabulary_folded = self._normalize_vocabulary(vocabulary)
+        
+        # Try the in-process cache first; the Redis key is only derived on a miss
+        local_key = self._local_key(vocabulary, difficulty, story_type)
+        cached_story = self._get_local_story(local_key)
+        if cached_story:
+            logger.debug("Story retrieved from in-process cache: %s", cached_story.cache_key)
+            return cached_story
+        
+        flight = self._join_flight(
+            local_key, self._generate_uncached,
+            local_key, vocabulary, vocabulary_folded, difficulty, story_type, max_length
+        )
         
-        # Try to get from cache first
-        cached_story = await self._get_cached_story(cache_key)
+        # Shielded so one caller going away doesn't cancel the story for the others
+        return await asyncio.shield(flight)
+
+    def peek_story(self, vocabulary: List[str], difficulty: int = 1, story_type: str = "general") -> Optional[Story]:
+        """Return the story from the in-process cache without generating or touching Redis"""
+        vocabulary, _ = self._normalize_vocabulary(vocabulary)
+        return self._get_local_story(self._local_key(vocabulary, difficulty, story_type))
+
+    def _normalize_vocabulary(self, vocabulary: List[str]) -> Tuple[List[str], List[str]]:
+        """Return the stripped vocabulary and its casefolded form"""
+        vocabulary = [word.strip() for word in vocabulary]
+        return vocabulary, [word.casefold() for word in vocabulary]
+
+    def _join_flight(self, local_key: tuple, func, *args) -> asyncio.Task:
+        """Return the task in progress for local_key, starting func(*args) if there is none"""
+        flight = self._inflight.get(local_key)
+        if flight is None:
+            flight = asyncio.create_task(func(*args))
+            self._inflight[local_key] = flight
+            flight.add_done_callback(lambda _: self._inflight.pop(local_key, None))
+        return flight
+
+    async def _generate_uncached(
+        self,
+        local_key: tuple,
+        vocabulary: List[str],
+        vocabulary_folded: List[str],
+        difficulty: int,
+        story_type: str,
+        max_length: int
+    ) -> Story:
+        """Look the story up in Redis, generating and caching it on a miss"""
+        cache_key = self._redis_key(vocabulary, difficulty, story_type)
+        cached_story = await self._get_cached_story(local_key, cache_key)
         if cached_story:
-            print(f"Story retrieved from cache: {cache_key}")
+            logger.debug("Story retrieved from cache: %s", cache_key)
             return cached_story
         
-        # Generate new story
-        print(f"Generating new story for vocabulary: {vocabulary}")
+        return await self._generate_new(
+            local_key, cache_key, vocabulary, vocabulary_folded, difficulty, story_type, max_length
+        )
+
+    async def _generate_new(
+        self,
+        local_key: tuple,
+        cache_key: str,
+        vocabulary: List[str],
+        vocabulary_folded: List[str],
+        difficulty: int,
+        story_type: str,
+        max_length: int
+    ) -> Story:
+        """Generate a story with OpenAI and cache it"""
+        logger.info("Generating new story for vocabulary: %s", vocabulary)
         
         try:
             prompt = self._build_story_prompt(vocabulary, difficulty, story_type, max_length)
             
-            response = await self.openai_client.chat.completions.create(
-                model="gpt-4o-mini",  # Using gpt-4o-mini for cost efficiency
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": "You are a creative writing assistant specializing in educational content for English language learners. Write engaging, coherent stories that naturally incorporate vocabulary words."
-                    },
-                    {
-                        "role": "user", 
-                        "content": prompt
-                    }
-                ],
-                temperature=0.7,
-                max_tokens=1200,
-                top_p=1.0,
-            )
+            # English runs ~1.3 tokens per word; cap output near the requested length
+            # (never below the prompt's 300-word minimum) instead of a flat 1200
+            max_tokens = min(1200, int(max(max_length, 300) * 1.5) + 64)
+            
+            # Stream the completion so tokenizing overlaps with generation
+            parts = []
+            scanner = _TokenScanner()
+            usage = None
+            # Hold a concurrency slot for the whole upstream call, stream included
+            async with self._limit():
+                stream = await self.openai_client.chat.completions.create(
+                    model="gpt-4o-mini",  # Using gpt-4o-mini for cost efficiency
+                    messages=[
+                        {
+                            "role": "system", 
+                            "content": STORY_SYSTEM_PROMPT
+                        },
+                        {
+                            "role": "user", 
+                            "content": prompt
+                        }
+                    ],
+                    temperature=0.7,
+                    max_tokens=max_tokens,
+                    top_p=1.0,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                )
+                async for chunk in stream:
+                    if chunk.choices:
+                        delta = chunk.choices[0].delta.content
+                        if delta:
+                            parts.append(delta)
+                            scanner.feed(delta)
+                    if chunk.usage:
+                        usage = chunk.usage
             
-            story_content = response.choices[0].message.content.strip()
+            story_content = "".join(parts).strip()
             
-            # Count words
-            word_count = len(story_content.split())
+            # Report how much of the prompt was served from the provider's prefix cache
+            if usage:
+                prompt_details = getattr(usage, "prompt_tokens_details", None)
+                cached_tokens = getattr(prompt_details, "cached_tokens", 0) or 0
+                logger.debug("Prompt tokens: %d (cached: %d)", usage.prompt_tokens, cached_tokens)
+            
+            # Counted while streaming, same as len(story_content.split())
+            word_count = scanner.word_count
             
             # Check which vocabulary words were actually used
-            vocabulary_used = []
-            story_lower = story_content.lower()
-            for word in vocabulary:
-                if word.lower() in story_lower:
-                    vocabulary_used.append(word)
+            vocabulary_used = self._find_vocabulary_used(
+                story_content, vocabulary, vocabulary_folded, scanner.finish()
+            )
             
             # Create story object
             story = Story(
@@ -196,14 +491,82 @@ Please write the story now:
                 created_at=datetime.now()
             )
             
-            # Cache the story
-            await self._cache_story(story)
+            # Cache the story; the Redis write happens off the response path
+            self._cache_locally(local_key, story)
+            self._run_in_background(self._cache_story(story))
             
             return story
             
+        except (RateLimitError, InternalServerError) as e:
+            await self._cache_failure(cache_key)
+            raise StoryGenerationThrottled(f"Story generation failed: {str(e)}")
         except Exception as e:
             raise Exception(f"Story generation failed: {str(e)}")
 
+    async def generate_stories_bulk(self, specs: List[Tuple[List[str], int, str, int]]) -> List:
+        """
+        Generate stories for several (vocabulary, difficulty, story_type, max_length) specs.
+        Redis is checked for all of them in one round trip and only the misses go to
+        OpenAI, concurrently. Returns one Story (or the raised exception) per spec, in order.
+        """
+        results: List = [None] * len(specs)
+        waiting: Dict[tuple, List[int]] = {}
+        flights: Dict[tuple, asyncio.Task] = {}
+        lookups: Dict[tuple, tuple] = {}
+        
+        for i, (vocabulary, difficulty, story_type, max_length) in enumerate(specs):
+            vocabulary, vocabulary_folded = self._normalize_vocabulary(vocabulary)
+            local_key = self._local_key(vocabulary, difficulty, story_type)
+            cached_story = self._get_local_story(local_key)
+            if cached_story:
+                results[i] = cached_story
+                continue
+            
+            waiting.setdefault(local_key, []).append(i)
+            if local_key in flights or local_key in lookups:
+                continue
+            if local_key in self._inflight:
+                flights[local_key] = self._inflight[local_key]
+            else:
+                cache_key = self._redis_key(vocabulary, difficulty, story_type)
+                lookups[local_key] = (cache_key, vocabulary, vocabulary_folded, difficulty, story_type, max_length)
+        
+        cached = await self._get_cached_stories(
+            [(local_key, spec[0]) for local_key, spec in lookups.items()]
+        )
+        for (local_key, spec), cached_story in zip(lookups.items(), cached):
+            if cached_story is None:
+                flights[local_key] = self._join_flight(local_key, self._generate_new, local_key, *spec)
+            else:
+                for i in waiting[local_key]:
+                    results[i] = cached_story
+        
+        outcomes = await asyncio.gather(
+            *[asyncio.shield(flight) for flight in flights.values()],
+            return_exceptions=True
+        )
+        for local_key, outcome in zip(flights, outcomes):
+            for i in waiting[local_key]:
+                results[i] = outcome
+        
+        return results
+
+    async def generate_batch(
+        self,
+        vocabularies: List[List[str]],
+        difficulty: int = 1,
+        story_type: str = "general",
+        max_length: int = 800
+    ) -> List:
+        """
+        Generate stories for several vocabulary lists sharing the same prompt parameters.
+        Identical vocabulary sets are generated once. Returns one Story (or the raised
+        exception) per input, in order.
+        """
+        return await self.generate_stories_bulk(
+            [(vocabulary, difficulty, story_type, max_length) for vocabulary in vocabularies]
+        )
+
     async def test_connection(self) -> dict:
         """Test OpenAI API connection"""
         try:
@@ -222,6 +585,9 @@ Please write the story now:
             raise Exception(f"OpenAI connection test failed: {str(e)}")
 
     async def close(self):
-        """Close Redis connection"""
+        """Finish pending cache writes and close Redis connection"""
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        
         if self.redis_client:
             await self.redis_client.close()
\ No newline at end of file
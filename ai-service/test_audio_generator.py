@@ -0,0 +1,176 @@
+"""
+Audio generator tests
+Runs AudioGenerator against a mocked Azure endpoint in a temp directory (run with: python -m pytest)
+"""
+
+import asyncio
+import os
+import time
+
+import httpx
+import pytest
+
+from src.audio_generator.generator import AudioGenerator
+
+AUDIO_BYTES = b"ID3" + b"\x00" * 64
+
+class StubAzure:
+    """Answers the token and synthesis endpoints, recording every request"""
+
+    def __init__(self, tts_status=200):
+        self.tts_status = tts_status
+        self.token_requests = 0
+        self.tts_requests = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/issueToken"):
+            self.token_requests += 1
+            return httpx.Response(200, text=f"token-{self.token_requests}")
+
+        self.tts_requests.append(request)
+        if self.tts_status != 200:
+            return httpx.Response(self.tts_status, text="synthesis refused")
+        return httpx.Response(200, content=AUDIO_BYTES)
+
+def make_generator(monkeypatch, tmp_path, azure=None):
+    monkeypatch.setenv("AZURE_SPEECH_KEY", "test-key")
+    monkeypatch.chdir(tmp_path)
+    azure = azure or StubAzure()
+    client = httpx.AsyncClient(transport=httpx.MockTransport(azure.handler))
+    return AudioGenerator(http_client=client), azure
+
+@pytest.mark.asyncio
+async def test_generate_audio_writes_the_file_atomically(monkeypatch, tmp_path):
+    generator, azure = make_generator(monkeypatch, tmp_path)
+
+    url = await generator.generate_audio("Hello there.")
+
+    filename = generator._audio_filename("Hello there.")
+    assert url == f"/audio/{filename}"
+    assert os.listdir(generator.audio_dir) == [filename]
+    with open(os.path.join(generator.audio_dir, filename), "rb") as audio_file:
+        assert audio_file.read() == AUDIO_BYTES
+    assert len(azure.tts_requests) == 1
+
+@pytest.mark.asyncio
+async def test_cached_audio_skips_synthesis_and_refreshes_its_age(monkeypatch, tmp_path):
+    generator, azure = make_generator(monkeypatch, tmp_path)
+    await generator.generate_audio("Hello there.")
+
+    file_path = os.path.join(generator.audio_dir, generator._audio_filename("Hello there."))
+    old = time.time() - 3600
+    os.utime(file_path, (old, old))
+
+    url = await generator.generate_audio("Hello there.")
+
+    assert url.endswith(generator._audio_filename("Hello there."))
+    assert len(azure.tts_requests) == 1
+    assert os.path.getmtime(file_path) > old + 60
+
+@pytest.mark.asyncio
+async def test_failed_synthesis_leaves_no_partial_file(monkeypatch, tmp_path):
+    generator, azure = make_generator(monkeypatch, tmp_path, StubAzure(tts_status=500))
+
+    assert await generator.generate_audio("Hello there.") is None
+    assert os.listdir(generator.audio_dir) == []
+
+@pytest.mark.asyncio
+async def test_cancelled_synthesis_leaves_no_partial_file(monkeypatch, tmp_path):
+    started = asyncio.Event()
+
+    async def slow_handler(request):
+        if request.url.path.endswith("/issueToken"):
+            return httpx.Response(200, text="token")
+        started.set()
+        await asyncio.sleep(10)
+        return httpx.Response(200, content=AUDIO_BYTES)
+
+    monkeypatch.setenv("AZURE_SPEECH_KEY", "test-key")
+    monkeypatch.chdir(tmp_path)
+    generator = AudioGenerator(http_client=httpx.AsyncClient(transport=httpx.MockTransport(slow_handler)))
+
+    task = asyncio.create_task(generator.generate_audio("Hello there."))
+    await started.wait()
+    assert [name for name in os.listdir(generator.audio_dir) if name.endswith(".part")]
+
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert os.listdir(generator.audio_dir) == []
+
+@pytest.mark.asyncio
+async def test_prune_cache_removes_only_expired_files(monkeypatch, tmp_path):
+    monkeypatch.setenv("AUDIO_CACHE_MAX_AGE_DAYS", "7")
+    generator, _ = make_generator(monkeypatch, tmp_path)
+
+    fresh = os.path.join(generator.audio_dir, "fresh.mp3")
+    stale = os.path.join(generator.audio_dir, "stale.mp3")
+    for path in (fresh, stale):
+        with open(path, "wb") as audio_file:
+            audio_file.write(AUDIO_BYTES)
+    old = time.time() - 8 * 24 * 60 * 60
+    os.utime(stale, (old, old))
+
+    assert await generator.prune_cache() == 1
+    assert os.listdir(generator.audio_dir) == ["fresh.mp3"]
+
+def test_prune_directory_ignores_a_missing_directory(tmp_path):
+    assert AudioGenerator._prune_directory(str(tmp_path / "missing"), 60) == 0
+
+@pytest.mark.asyncio
+async def test_access_token_is_reused_across_requests(monkeypatch, tmp_path):
+    generator, azure = make_generator(monkeypatch, tmp_path)
+
+    await generator.generate_audio("First story.")
+    await generator.generate_audio("Second story.")
+
+    assert azure.token_requests == 1
+    assert [request.headers["Authorization"] for request in azure.tts_requests] == ["Bearer token-1"] * 2
+    assert azure.tts_requests[0].headers["Content-Type"] == "application/ssml+xml"
+    assert b"First story." in azure.tts_requests[0].content
+
+@pytest.mark.asyncio
+async def test_expired_access_token_is_refreshed(monkeypatch, tmp_path):
+    generator, azure = make_generator(monkeypatch, tmp_path)
+    await generator.generate_audio("First story.")
+
+    generator._token_expires_at = 0.0
+    await generator.generate_audio("Second story.")
+
+    assert azure.token_requests == 2
+    assert azure.tts_requests[-1].headers["Authorization"] == "Bearer token-2"
+
+@pytest.mark.asyncio
+async def test_unauthorized_response_forces_a_token_refresh(monkeypatch, tmp_path):
+    azure = StubAzure(tts_status=401)
+    generator, _ = make_generator(monkeypatch, tmp_path, azure)
+
+    assert await generator.generate_audio("First story.") is None
+    assert generator._access_token is None
+
+    azure.tts_status = 200
+    assert await generator.generate_audio("First story.") is not None
+    assert azure.token_requests == 2
+    assert azure.tts_requests[-1].headers["Authorization"] == "Bearer token-2"
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_fetch_one_token(monkeypatch, tmp_path):
+    generator, azure = make_generator(monkeypatch, tmp_path)
+
+    await asyncio.gather(*[generator.generate_audio(f"Story {i}.") for i in range(5)])
+
+    assert azure.token_requests == 1
+    assert len(azure.tts_requests) == 5
+
+def test_audio_filename_is_derived_from_text_and_voice(monkeypatch, tmp_path):
+    generator, _ = make_generator(monkeypatch, tmp_path)
+
+    filename = generator._audio_filename("Hello there.")
+
+    assert filename == generator._audio_filename("Hello there.")
+    assert filename != generator._audio_filename("Hello there!")
+    assert filename.endswith("_en-US-JennyNeural.mp3")
+    assert len(filename.split("_")[0]) == 20
+
+    generator.voice_name = "en-US-AriaNeural"
+    assert generator._audio_filename("Hello there.") != filename
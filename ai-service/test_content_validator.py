@@ -0,0 +1,45 @@
+"""
+Content validator tests
+Checks the single-pass vocabulary coverage against a per-word search (run with: python -m pytest)
+"""
+
+import random
+import re
+
+import pytest
+
+from src.content_validator.validator import ContentValidator
+
+def reference_coverage(content_lower, vocab_lower):
+    """Coverage as one word-boundary search per word, the behaviour the single pass must keep"""
+    if not vocab_lower:
+        return 1.0
+    found = sum(1 for word in vocab_lower if re.search(r'\b' + re.escape(word) + r'\b', content_lower))
+    return found / len(vocab_lower)
+
+@pytest.mark.parametrize("content, vocabulary, coverage", [
+    ("we ate ice cream", ["ice", "ice cream"], 1.0),
+    ("the ice cream soda fizzed", ["ice cream", "cream soda"], 1.0),
+    ("nice creamy ice", ["ice cream"], 0.0),
+    ("a cat sat on the mat", ["cat", "dog"], 0.5),
+])
+def test_vocabulary_coverage_counts_overlapping_entries(content, vocabulary, coverage):
+    assert ContentValidator()._check_vocabulary_coverage(content, vocabulary) == coverage
+
+def test_vocabulary_coverage_matches_per_word_search():
+    rng = random.Random(1234)
+    syllables = ["ice", "cream", "soda", "nice", "a", "at", "cat"]
+    validator = ContentValidator()
+
+    for _ in range(3000):
+        vocabulary = list({
+            " ".join(rng.choice(syllables) for _ in range(rng.randint(1, 3)))
+            for _ in range(rng.randint(1, 6))
+        })
+        content = " ".join(
+            "".join(rng.choice(syllables) for _ in range(rng.randint(1, 2)))
+            for _ in range(rng.randint(0, 12))
+        )
+        assert validator._check_vocabulary_coverage(content, vocabulary) == reference_coverage(content, vocabulary), (
+            content, vocabulary
+        )
@@ -0,0 +1,98 @@
+"""
+AI service endpoint tests
+Exercises request validation and the /generate-story handler with stubbed services (run with: python -m pytest)
+"""
+
+import os
+
+# The story generator's OpenAI client requires a key at import time
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import asyncio
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+
+import main
+from src.story_generator.generator import Story
+
+def test_vocabulary_is_stripped_lowercased_and_deduped():
+    request = main.GenerateStoryRequest(vocabulary=["  Dragon ", "dragon", "", "Castle", "DRAGON"])
+
+    assert request.vocabulary == ["dragon", "castle"]
+
+@pytest.mark.parametrize("vocabulary, message", [
+    ([], "cannot be empty"),
+    (["  ", ""], "cannot be empty"),
+    ([f"word{i}" for i in range(21)], "max 20"),
+])
+def test_invalid_vocabulary_is_rejected(vocabulary, message):
+    with pytest.raises(ValidationError, match=message):
+        main.GenerateStoryRequest(vocabulary=vocabulary)
+
+def test_twenty_duplicated_words_count_once():
+    request = main.GenerateStoryRequest(vocabulary=[f"Word{i % 20}" for i in range(40)])
+
+    assert len(request.vocabulary) == 20
+
+def test_generate_story_rejects_bad_vocabulary_before_generating(monkeypatch):
+    async def fail_submit(**kwargs):
+        raise AssertionError("story generation should not be reached")
+
+    monkeypatch.setattr(main.story_batcher, "submit", fail_submit)
+    client = TestClient(main.app)
+
+    response = client.post("/generate-story", json={"vocabulary": [" ", ""]})
+
+    assert response.status_code == 422
+
+class StubStoryServices:
+    """Stands in for the batcher, validator and audio helper, recording how they overlap"""
+
+    def __init__(self, monkeypatch, is_valid=True):
+        self.is_valid = is_valid
+        self.audio_started = asyncio.Event()
+        self.audio_cancelled = False
+        monkeypatch.setattr(main.story_batcher, "submit", self.submit)
+        monkeypatch.setattr(main.content_validator, "validate", self.validate)
+        monkeypatch.setattr(main, "generate_story_audio", self.generate_audio)
+
+    async def submit(self, vocabulary, difficulty, story_type, max_length):
+        return Story("A dragon guarded the castle.", vocabulary, 5, difficulty, story_type, "key", datetime.now())
+
+    async def generate_audio(self, text):
+        self.audio_started.set()
+        try:
+            await asyncio.sleep(0.05)
+        except asyncio.CancelledError:
+            self.audio_cancelled = True
+            raise
+        return "/audio/story.mp3"
+
+    async def validate(self, content, vocabulary):
+        # Only returns once synthesis is under way, so the two must overlap
+        await asyncio.wait_for(self.audio_started.wait(), timeout=1)
+        return self.is_valid, 0.9
+
+@pytest.mark.asyncio
+async def test_audio_is_synthesized_while_the_story_is_validated(monkeypatch):
+    StubStoryServices(monkeypatch)
+
+    response = await main.generate_story(main.GenerateStoryRequest(vocabulary=["dragon", "castle"]))
+
+    assert response.audio_url == "/audio/story.mp3"
+    assert response.quality_score == 0.9
+
+@pytest.mark.asyncio
+async def test_invalid_story_cancels_its_audio(monkeypatch):
+    services = StubStoryServices(monkeypatch, is_valid=False)
+
+    with pytest.raises(HTTPException) as excinfo:
+        await main.generate_story(main.GenerateStoryRequest(vocabulary=["dragon"]))
+    await asyncio.sleep(0)
+
+    assert excinfo.value.status_code == 500
+    assert services.audio_cancelled
@@ -0,0 +1,110 @@
+"""
+Story batcher tests
+Runs StoryBatcher against a stub generator (run with: python -m pytest)
+"""
+
+import asyncio
+
+import pytest
+
+from src.story_generator.batcher import StoryBatcher
+
+class StubBatchGenerator:
+    """Records generate_batch calls; vocabularies containing "bad" fail"""
+
+    def __init__(self):
+        self.batches = []
+        # Stories already in the "in-process cache", keyed by vocabulary tuple
+        self.cached = {}
+
+    def peek_story(self, vocabulary, difficulty, story_type):
+        return self.cached.get(tuple(vocabulary))
+
+    async def generate_batch(self, vocabularies, difficulty, story_type, max_length):
+        self.batches.append((difficulty, story_type, max_length, [tuple(v) for v in vocabularies]))
+        await asyncio.sleep(0.01)
+        return [
+            ValueError("bad vocabulary") if "bad" in vocabulary else (difficulty, tuple(vocabulary))
+            for vocabulary in vocabularies
+        ]
+
+@pytest.mark.asyncio
+async def test_batcher_groups_requests_by_prompt_parameters():
+    generator = StubBatchGenerator()
+    batcher = StoryBatcher(generator, max_batch=8, max_wait_ms=20)
+    await batcher.start()
+
+    results = await asyncio.gather(*[
+        batcher.submit([f"word{i}"], difficulty=1 + i % 2) for i in range(6)
+    ])
+    await batcher.stop()
+
+    assert results == [(1 + i % 2, (f"word{i}",)) for i in range(6)]
+    assert sorted((difficulty, len(vocabularies)) for difficulty, _, _, vocabularies in generator.batches) == [(1, 3), (2, 3)]
+
+@pytest.mark.asyncio
+async def test_batcher_respects_max_batch():
+    generator = StubBatchGenerator()
+    batcher = StoryBatcher(generator, max_batch=2, max_wait_ms=20)
+    await batcher.start()
+
+    await asyncio.gather(*[batcher.submit([f"word{i}"]) for i in range(5)])
+    await batcher.stop()
+
+    assert all(len(vocabularies) <= 2 for _, _, _, vocabularies in generator.batches)
+    assert sum(len(vocabularies) for _, _, _, vocabularies in generator.batches) == 5
+
+@pytest.mark.asyncio
+async def test_batcher_fans_exceptions_back_to_their_callers():
+    generator = StubBatchGenerator()
+    batcher = StoryBatcher(generator, max_batch=8, max_wait_ms=20)
+    await batcher.start()
+
+    results = await asyncio.gather(
+        batcher.submit(["good"]),
+        batcher.submit(["bad"]),
+        batcher.submit(["fine"]),
+        return_exceptions=True
+    )
+    await batcher.stop()
+
+    assert results[0] == (1, ("good",))
+    assert isinstance(results[1], ValueError)
+    assert results[2] == (1, ("fine",))
+
+@pytest.mark.asyncio
+async def test_batcher_stop_fails_requests_still_waiting_for_a_batch():
+    generator = StubBatchGenerator()
+    batcher = StoryBatcher(generator, max_batch=8, max_wait_ms=1000)
+    await batcher.start()
+
+    pending = asyncio.create_task(batcher.submit(["word"]))
+    await asyncio.sleep(0.01)
+    await batcher.stop()
+
+    with pytest.raises(Exception, match="Story batcher stopped"):
+        await asyncio.wait_for(pending, timeout=1)
+    assert generator.batches == []
+
+@pytest.mark.asyncio
+async def test_batcher_calls_generator_directly_when_not_started():
+    class DirectGenerator:
+        async def generate_story(self, vocabulary, difficulty, story_type, max_length):
+            return ("direct", tuple(vocabulary))
+
+    batcher = StoryBatcher(DirectGenerator())
+
+    assert await batcher.submit(["word"]) == ("direct", ("word",))
+
+@pytest.mark.asyncio
+async def test_batcher_returns_local_cache_hits_without_queueing():
+    generator = StubBatchGenerator()
+    generator.cached[("cached",)] = "cached story"
+    batcher = StoryBatcher(generator, max_batch=8, max_wait_ms=1000)
+    await batcher.start()
+
+    result = await asyncio.wait_for(batcher.submit(["cached"]), timeout=0.1)
+    await batcher.stop()
+
+    assert result == "cached story"
+    assert generator.batches == []
@@ -0,0 +1,289 @@
+"""
+Story generator tests
+Runs StoryGenerator against stub OpenAI and Redis clients (run with: python -m pytest)
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import msgpack
+import pytest
+from openai import RateLimitError
+
+from src.story_generator.generator import StoryGenerationThrottled, StoryGenerator, _TokenScanner
+
+STORY_TEXT = "The students' dog found a 'mysterious' map.  Don't explore alone,\nsaid the guide!"
+
+class StubCompletions:
+    """Stands in for chat.completions, streaming a fixed story in chunks"""
+
+    def __init__(self, chunks=None, error=None, delay=0.01):
+        self.chunks = chunks or [STORY_TEXT[:9], STORY_TEXT[9:30], STORY_TEXT[30:]]
+        self.error = error
+        self.delay = delay
+        self.calls = []
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+
+        if not kwargs.get("stream"):
+            return SimpleNamespace(
+                choices=[SimpleNamespace(message=SimpleNamespace(content="Hello, LexiLoop!"))],
+                usage=SimpleNamespace(total_tokens=12)
+            )
+
+        async def stream():
+            for text in self.chunks:
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))], usage=None)
+            yield SimpleNamespace(
+                choices=[],
+                usage=SimpleNamespace(prompt_tokens=20, completion_tokens=15, prompt_tokens_details=None)
+            )
+        return stream()
+
+class FakePipeline:
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def mget(self, keys):
+        self.commands.append(("mget", keys))
+
+    def expire(self, key, ttl):
+        self.commands.append(("expire", key))
+
+    async def execute(self):
+        self.redis_client.round_trips += 1
+        return [
+            [self.redis_client.store.get(key) for key in arg] if name == "mget" else True
+            for name, arg in self.commands
+        ]
+
+class FakeRedis:
+    """In-memory stand-in for the redis.asyncio client calls the generator makes"""
+
+    def __init__(self):
+        self.store = {}
+        self.round_trips = 0
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def setex(self, key, ttl, value):
+        self.store[key] = value
+
+    async def close(self):
+        pass
+
+def make_generator(monkeypatch, completions=None):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    generator = StoryGenerator()
+    generator.openai_client = SimpleNamespace(chat=SimpleNamespace(completions=completions or StubCompletions()))
+    generator.redis_client = FakeRedis()
+    return generator
+
+def rate_limit_error():
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    return RateLimitError("Rate limit reached", response=httpx.Response(429, request=request), body=None)
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 16, len(STORY_TEXT)])
+def test_token_scanner_is_independent_of_chunking(chunk_size):
+    whole = _TokenScanner()
+    whole.feed(STORY_TEXT)
+
+    scanner = _TokenScanner()
+    for start in range(0, len(STORY_TEXT), chunk_size):
+        scanner.feed(STORY_TEXT[start:start + chunk_size])
+
+    assert scanner.finish() == whole.finish()
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 16, len(STORY_TEXT)])
+def test_token_scanner_word_count_matches_split(chunk_size):
+    scanner = _TokenScanner()
+    for start in range(0, len(STORY_TEXT), chunk_size):
+        scanner.feed(STORY_TEXT[start:start + chunk_size])
+
+    assert scanner.word_count == len(STORY_TEXT.split())
+
+def test_token_scanner_strips_quotes_and_possessives():
+    scanner = _TokenScanner()
+    scanner.feed(STORY_TEXT)
+    tokens = scanner.finish()
+
+    assert {"students", "dog", "mysterious", "don't"} <= tokens
+    assert "students'" not in tokens
+
+def test_find_vocabulary_used_matches_phrases_on_word_boundaries(monkeypatch):
+    generator = make_generator(monkeypatch)
+    vocabulary = ["ice cream", "well-known"]
+
+    assert generator._find_vocabulary_used("A nice creamy, swell-known dessert.", vocabulary) == []
+    assert generator._find_vocabulary_used("Ice cream is well-known.", vocabulary) == vocabulary
+
+@pytest.mark.asyncio
+async def test_generate_story_streams_and_detects_vocabulary(monkeypatch):
+    completions = StubCompletions()
+    generator = make_generator(monkeypatch, completions)
+
+    story = await generator.generate_story(["students", "mysterious", "explore", "dragon"], max_length=300)
+
+    assert story.content == STORY_TEXT.strip()
+    assert story.vocabulary_used == ["students", "mysterious", "explore"]
+    assert completions.calls[0]["stream"] is True
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("max_length, max_tokens", [(100, 514), (300, 514), (500, 814), (800, 1200)])
+async def test_max_tokens_follows_requested_length(monkeypatch, max_length, max_tokens):
+    completions = StubCompletions()
+    generator = make_generator(monkeypatch, completions)
+
+    await generator.generate_story(["map"], max_length=max_length)
+
+    assert completions.calls[0]["max_tokens"] == max_tokens
+
+@pytest.mark.asyncio
+async def test_test_connection_reports_the_reply(monkeypatch):
+    generator = make_generator(monkeypatch)
+
+    result = await generator.test_connection()
+
+    assert result == {"model": "gpt-4o-mini", "response": "Hello, LexiLoop!", "tokens_used": 12}
+
+@pytest.mark.asyncio
+async def test_rate_limit_is_negatively_cached(monkeypatch):
+    completions = StubCompletions(error=rate_limit_error())
+    generator = make_generator(monkeypatch, completions)
+
+    with pytest.raises(StoryGenerationThrottled):
+        await generator.generate_story(["map"])
+    with pytest.raises(StoryGenerationThrottled):
+        await generator.generate_story(["map"])
+
+    assert len(completions.calls) == 1
+    assert f"story:neg:{generator._redis_key(['map'], 1, 'general')}" in generator.redis_client.store
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_share_one_upstream_call(monkeypatch):
+    completions = StubCompletions()
+    generator = make_generator(monkeypatch, completions)
+
+    stories = await asyncio.gather(*[generator.generate_story(["map", "guide"]) for _ in range(5)])
+
+    assert len(completions.calls) == 1
+    assert all(story is stories[0] for story in stories)
+
+@pytest.mark.asyncio
+async def test_failure_reaches_every_waiter(monkeypatch):
+    completions = StubCompletions(error=ValueError("upstream exploded"))
+    generator = make_generator(monkeypatch, completions)
+
+    results = await asyncio.gather(
+        *[generator.generate_story(["map"]) for _ in range(3)],
+        return_exceptions=True
+    )
+
+    assert len(completions.calls) == 1
+    assert all(isinstance(result, Exception) and "upstream exploded" in str(result) for result in results)
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_the_shared_generation(monkeypatch):
+    completions = StubCompletions(delay=0.05)
+    generator = make_generator(monkeypatch, completions)
+
+    first = asyncio.create_task(generator.generate_story(["map"]))
+    second = asyncio.create_task(generator.generate_story(["map"]))
+    await asyncio.sleep(0.01)
+    first.cancel()
+
+    story = await second
+    assert story.content == STORY_TEXT.strip()
+    assert len(completions.calls) == 1
+
+@pytest.mark.asyncio
+async def test_bulk_uses_one_redis_round_trip_and_generates_only_misses(monkeypatch):
+    completions = StubCompletions()
+    generator = make_generator(monkeypatch, completions)
+
+    cached = await generator.generate_story(["map"])
+    await generator.close()
+    generator._local_cache.clear()
+    completions.calls.clear()
+    generator.redis_client.round_trips = 0
+
+    results = await generator.generate_stories_bulk([
+        (["map"], 1, "general", 800),
+        (["guide"], 1, "general", 800),
+        ([" map "], 1, "general", 800),
+    ])
+
+    assert generator.redis_client.round_trips == 1
+    assert len(completions.calls) == 1
+    assert results[0].content == cached.content
+    assert results[0] is results[2]
+    assert results[1].vocabulary_used == ["guide"]
+
+@pytest.mark.asyncio
+async def test_bulk_treats_unreadable_entry_as_a_miss_for_its_key_only(monkeypatch):
+    completions = StubCompletions()
+    generator = make_generator(monkeypatch, completions)
+    store = generator.redis_client.store
+
+    old_key = generator._redis_key(["map"], 1, "general")
+    throttled_key = generator._redis_key(["dragon"], 1, "general")
+    cached_key = generator._redis_key(["guide"], 1, "general")
+    store[f"story:{old_key}"] = b'{"content": "stored before msgpack"}'
+    store[f"story:neg:{throttled_key}"] = b"rate_limited"
+    store[f"story:{cached_key}"] = msgpack.packb(
+        ["Cached story.", ["guide"], 2, 1, "general", cached_key, "2024-01-01T00:00:00"]
+    )
+
+    results = await generator.generate_stories_bulk([
+        (["map"], 1, "general", 800),
+        (["dragon"], 1, "general", 800),
+        (["guide"], 1, "general", 800),
+    ])
+
+    assert results[0].content == STORY_TEXT.strip()
+    assert isinstance(results[1], StoryGenerationThrottled)
+    assert results[2].content == "Cached story."
+    assert len(completions.calls) == 1
+
+@pytest.mark.asyncio
+async def test_concurrency_limit_applies_per_openai_call(monkeypatch):
+    completions = StubCompletions()
+    in_flight = peak = 0
+    create = completions.create
+
+    async def tracked_create(**kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        stream = await create(**kwargs)
+
+        async def tracked_stream():
+            nonlocal in_flight
+            async for chunk in stream:
+                await asyncio.sleep(0)
+                yield chunk
+            in_flight -= 1
+        return tracked_stream()
+
+    completions.create = tracked_create
+    generator = make_generator(monkeypatch, completions)
+    generator.concurrency = asyncio.Semaphore(2)
+
+    stories = await generator.generate_batch([[f"word{i}"] for i in range(8)])
+
+    assert len(stories) == 8
+    assert len(completions.calls) == 8
+    assert peak == 2